@@ -0,0 +1,334 @@
+"""
+This file contains test cases to verify that the bitboard representation used
+by the search in game_agent.py agrees with the reference `isolation.Board`.
+"""
+import itertools
+import random
+import unittest
+from unittest import mock
+
+import isolation
+import game_agent
+
+
+def reference_accessible(game, player, max_generation):
+    """Breadth-first search over (row, col) points, as game_agent originally
+    computed its accessibility rating.
+    """
+    explored = set()
+    frontier = [game.get_player_location(player)]
+    access_rating = 1
+    for generation in range(1, max_generation + 1):
+        new_frontier = []
+        for row, col in frontier:
+            for dr, dc in game_agent.KNIGHT_DIRECTIONS:
+                point = (row + dr, col + dc)
+                if game.move_is_legal(point) and point not in explored:
+                    explored.add(point)
+                    new_frontier.append(point)
+                    access_rating += 1. / generation
+        frontier = new_frontier
+    return access_rating, explored
+
+
+def random_board(w, h, num_moves, player_1="Player1", player_2="Player2"):
+    """Return a Board with a random sequence of (legal) moves applied."""
+    board = isolation.Board(player_1, player_2, w, h)
+    for _ in range(num_moves):
+        moves = board.get_legal_moves()
+        if not moves:
+            break
+        board.apply_move(random.choice(moves))
+    return board
+
+
+class BitBoardTest(unittest.TestCase):
+
+    def test_matches_board(self):
+        """ Test BitBoard against isolation.Board over random games """
+        random.seed(0)
+        for w, h in [(7, 7), (5, 5), (9, 6), (4, 8)]:
+            board = isolation.Board("Player1", "Player2", w, h)
+            bits = game_agent.BitBoard.from_board(board)
+
+            while True:
+                self.assertEqual(board.get_legal_moves(), bits.get_legal_moves())
+                self.assertEqual(board.active_player, bits.active_player)
+                self.assertEqual(board.to_string(), bits.to_string())
+                for player in ("Player1", "Player2"):
+                    self.assertEqual(board.get_legal_moves(player),
+                                     bits.get_legal_moves(player))
+                    self.assertEqual(board.get_player_location(player),
+                                     bits.get_player_location(player))
+                    self.assertEqual(board.utility(player), bits.utility(player))
+
+                moves = board.get_legal_moves()
+                if not moves:
+                    break
+                move = random.choice(moves)
+                board.apply_move(move)
+                bits = bits.forecast_move(move)
+                self.assertEqual(bits.zobrist, bits.compute_zobrist())
+
+    def test_push_pop(self):
+        """ Test that BitBoard.pop exactly reverts BitBoard.push """
+        random.seed(3)
+        for _ in range(50):
+            bits = game_agent.BitBoard.from_board(random_board(7, 7, random.randint(0, 20)))
+            history = []
+            for _ in range(random.randint(1, 10)):
+                moves = list(game_agent.bit_squares(bits.legal_mask()))
+                if not moves:
+                    break
+                history.append(bits.copy())
+                bits.push(random.choice(moves))
+            while history:
+                bits.pop()
+                expect = history.pop()
+                self.assertEqual((bits.blocked, bits.p1_sq, bits.p2_sq, bits.active,
+                                  bits.move_count, bits.zobrist),
+                                 (expect.blocked, expect.p1_sq, expect.p2_sq, expect.active,
+                                  expect.move_count, expect.zobrist))
+
+    def test_hash_key(self):
+        """ Test hash_key under each rotation matches the rotated board's hash """
+        random.seed(8)
+        for w, h in [(7, 7), (9, 6)]:
+            for _ in range(20):
+                board = random_board(w, h, random.randint(0, 20))
+                bits = game_agent.BitBoard.from_board(board)
+                for rotation, rotate in bits.geometry.symmetries.items():
+                    rotated = bits.copy()
+                    rotated.blocked = sum(1 << rotate[sq] for sq in game_agent.bit_squares(bits.blocked))
+                    rotated.p1_sq, rotated.p2_sq = rotate[bits.p1_sq], rotate[bits.p2_sq]
+                    rotated.zobrist = rotated.compute_zobrist()
+                    self.assertEqual(game_agent.hash_key(board, rotation),
+                                     game_agent.hash_key(rotated, game_agent.NORTH))
+
+    def test_find_accessible(self):
+        """ Test the bitboard flood-fill against a breadth-first search """
+        random.seed(1)
+        for _ in range(200):
+            board = random_board(7, 7, random.randint(2, 30))
+            for player in ("Player1", "Player2"):
+                rating, explored = game_agent.find_accessible(board, player, 5)
+                expect_rating, expect_explored = reference_accessible(board, player, 5)
+                self.assertAlmostEqual(rating, expect_rating)
+                self.assertEqual(explored, sum(1 << (row * 7 + col)
+                                               for row, col in expect_explored))
+
+    def test_access_cache_board_size(self):
+        """ Test cached flood-fills are not shared between boards of different sizes """
+        for w, h in [(5, 5), (7, 7)]:
+            bits = game_agent.BitBoard("Player1", "Player2", w, h)
+            bits.blocked, bits.p1_sq, bits.p2_sq = 0b111, 0, 2
+            expect = game_agent.flood_fill(bits.blocked, 0, 5, bits.geometry.knight_shifts)
+            self.assertEqual(game_agent.find_accessible(bits, "Player1", 5), expect)
+            expect = game_agent.dual_flood_fill(bits.blocked, 0, 2, 5, bits.geometry)
+            self.assertEqual(game_agent.find_accessibility_pair(bits, "Player1", 5), expect)
+
+    def test_accessibility_pair(self):
+        """ Test the paired flood-fill against find_accessible for each player """
+        random.seed(4)
+        for _ in range(200):
+            board = random_board(7, 7, random.randint(2, 30))
+            bits = game_agent.BitBoard.from_board(board)
+            for player in ("Player1", "Player2"):
+                opponent = board.get_opponent(player)
+                rating, oppose_rating = game_agent.find_accessibility_pair(bits, player, 5)
+                self.assertAlmostEqual(rating, game_agent.find_accessible(board, player, 5)[0])
+                self.assertAlmostEqual(oppose_rating,
+                                       game_agent.find_accessible(board, opponent, 5)[0])
+
+    def test_batch_improved(self):
+        """ Test batched move counts and scores against the single-state versions """
+        random.seed(5)
+        geometry = game_agent.board_geometry(7, 7)
+        boards = [game_agent.BitBoard.from_board(random_board(7, 7, random.randint(2, 30)))
+                  for _ in range(40)]
+        own_counts, opp_counts = game_agent.batch_improved(
+            [bits.blocked for bits in boards], [bits.p1_sq for bits in boards],
+            [bits.p2_sq for bits in boards], geometry)
+        self.assertEqual(own_counts, [len(bits.get_legal_moves("Player1")) for bits in boards])
+        self.assertEqual(opp_counts, [len(bits.get_legal_moves("Player2")) for bits in boards])
+
+        for bits in boards:
+            moves = list(game_agent.bit_squares(bits.legal_mask()))
+            for player in ("Player1", "Player2"):
+                with mock.patch.object(game_agent, 'next_noise', itertools.cycle(game_agent.NOISE).__next__):
+                    scores = game_agent.improved_salt_batch(bits, player, moves)
+                with mock.patch.object(game_agent, 'next_noise', itertools.cycle(game_agent.NOISE).__next__):
+                    expect = [game_agent.improved_salt_score(bits.forecast_move(bits.geometry.moves[move]), player)
+                              for move in moves]
+                self.assertEqual(scores, expect)
+
+                scores = game_agent.fast_improved_batch(bits, player, moves)
+                expect = [game_agent.fast_improved_score(bits.forecast_move(bits.geometry.moves[move]), player)
+                          for move in moves]
+                self.assertEqual(scores, expect)
+
+    def test_fast_alphabeta(self):
+        """ Test alphabeta over a BitBoard agrees with the reference search """
+        random.seed(2)
+        for _ in range(20):
+            agentUT = game_agent.CustomPlayer(
+                score_fn=game_agent.fast_improved_score, iterative=False)
+            agentUT.time_left = lambda: 1e3
+            board = random_board(7, 7, random.randint(2, 20), agentUT)
+            bits = game_agent.BitBoard.from_board(board)
+            maximize = board.active_player == agentUT
+
+            for depth in range(1, 5):
+                expect, _ = agentUT.alphabeta(board, depth, maximize=maximize)
+                score, _ = agentUT.alphabeta(bits, depth, maximize=maximize)
+                self.assertEqual(score, expect)
+
+            # (Stored scores are only consistent with maximize on the
+            # player's own turn.)
+            with self.assertRaises(ValueError):
+                agentUT.alphabeta(bits, 1, maximize=not maximize)
+
+    def test_transposition_reuse(self):
+        """ Test alphabeta agrees with the reference search after bounds are stored for the same states """
+        random.seed(7)
+        agentUT = game_agent.CustomPlayer(
+            score_fn=game_agent.fast_improved_score, iterative=False)
+        agentUT.time_left = lambda: 1e3
+        for _ in range(30):
+            board = random_board(7, 7, random.randint(2, 20), agentUT)
+            bits = game_agent.BitBoard.from_board(board)
+            maximize = board.active_player == agentUT
+
+            for depth in range(1, 5):
+                expect, _ = agentUT.alphabeta(board, depth, maximize=maximize)
+                for lower, upper in ((expect - 1, expect), (expect, expect + 1)):
+                    agentUT.alphabeta(bits, depth, lower, upper, maximize=maximize)
+                score, move = agentUT.alphabeta(bits, depth, maximize=maximize)
+                self.assertEqual(score, expect)
+                if bits.get_legal_moves():
+                    self.assertIn(move, bits.get_legal_moves())
+
+    def test_deeper_bound_reuse(self):
+        """ Test a shallower search failing against a bound stored from a deeper one doesn't store it as exact """
+        random.seed(11)
+        agentUT = game_agent.CustomPlayer(
+            score_fn=game_agent.fast_improved_score, iterative=False)
+        agentUT.time_left = lambda: 1e3
+        checked = 0
+        while checked < 10:
+            board = random_board(7, 7, random.randint(2, 20), agentUT)
+            bits = game_agent.BitBoard.from_board(board)
+            if board.active_player != agentUT or not board.get_legal_moves():
+                continue
+            deep, _ = agentUT.alphabeta(board, 4)
+            expect, _ = agentUT.alphabeta(board, 2)
+            if deep == expect:
+                continue
+            checked += 1
+
+            for lower, upper in ((deep - 1, deep), (deep, deep + 1)):
+                # Keep only the root's bound from the deeper search.
+                agentUT.tt.clear()
+                agentUT.alphabeta(bits, 4, lower, upper)
+                root_entries = {slot: entry for slot, entry in agentUT.tt.items() if entry[1] == 4}
+                agentUT.tt.clear()
+                agentUT.tt.update(root_entries)
+
+                agentUT.alphabeta(bits, 2)
+                score, _ = agentUT.alphabeta(bits, 2)
+                self.assertEqual(score, expect)
+
+    def test_transposition_across_moves(self):
+        """ Test iterative deepening agrees with the reference search with the table kept between moves """
+        random.seed(9)
+        for _ in range(5):
+            agentUT = game_agent.CustomPlayer(
+                score_fn=game_agent.fast_improved_score, iterative=False)
+            agentUT.time_left = lambda: 1e3
+            board = random_board(7, 7, 2, agentUT)
+
+            while board.get_legal_moves():
+                if board.active_player == agentUT:
+                    # Entries kept from earlier moves are searched no deeper
+                    # than the final iteration needs, so only its own entries
+                    # can cut it short, and it must match the reference.
+                    bits = game_agent.BitBoard.from_board(board)
+                    result = agentUT.try_move(bits, 1)
+                    for depth in range(2, 5):
+                        result = agentUT.try_aspiration(bits, depth, result[0])
+                    expect, _ = agentUT.alphabeta(board, 4)
+                    self.assertEqual(result[0], expect)
+                    move = result[1]
+                    if move not in board.get_legal_moves():
+                        move = board.get_legal_moves()[0]
+                else:
+                    move = random.choice(board.get_legal_moves())
+                board.apply_move(move)
+
+    def test_asymmetric_score_transpositions(self):
+        """ Test states don't share entries with their reflection under a score that tells them apart """
+        random.seed(10)
+        agentUT = game_agent.CustomPlayer(
+            score_fn=game_agent.reflect_score, iterative=False)
+        agentUT.time_left = lambda: 1e3
+        with mock.patch.object(game_agent, 'next_noise', lambda: 0.):
+            for _ in range(20):
+                board = random_board(7, 5, random.randint(3, 12), agentUT)
+                mirror = board.copy()
+                mirror.__board_state__ = [row[::-1] for row in board.__board_state__]
+                for player, move in board.__last_player_move__.items():
+                    if move != isolation.Board.NOT_MOVED:
+                        mirror.__last_player_move__[player] = (move[0], board.width - 1 - move[1])
+                maximize = board.active_player == agentUT
+
+                # (Entries searched deeper from earlier boards could stand in
+                # for the reference's shallower scores.)
+                agentUT.tt.clear()
+                for depth in range(1, 4):
+                    expect, _ = agentUT.alphabeta(mirror, depth, maximize=maximize)
+                    agentUT.alphabeta(game_agent.BitBoard.from_board(board), depth, maximize=maximize)
+                    score, _ = agentUT.alphabeta(game_agent.BitBoard.from_board(mirror), depth, maximize=maximize)
+                    self.assertEqual(score, expect)
+
+    def test_get_move_keeps_last_move(self):
+        """ Test get_move keeps the last iteration's move once a deeper one proves a loss """
+        random.seed(12)
+        agentUT = game_agent.CustomPlayer(
+            search_depth=3, score_fn=game_agent.fast_improved_score, iterative=True)
+        board = random_board(7, 7, 2, agentUT)
+        legal_moves = board.get_legal_moves()
+        move = legal_moves[-1]
+        results = iter([(1., move), (game_agent.MIN_VAL, (-1, -1)), None])
+        with mock.patch.object(game_agent.CustomPlayer, 'try_move', lambda *args: next(results)), \
+             mock.patch.object(game_agent.CustomPlayer, 'try_aspiration', lambda *args: next(results)):
+            self.assertEqual(agentUT.get_move(board, legal_moves, lambda: 1e3), move)
+
+    def test_timed_games(self):
+        """ Test the player never runs out of time over whole games played under the time limit """
+        random.seed(13)
+        for _ in range(3):
+            player_1 = game_agent.CustomPlayer()
+            player_2 = game_agent.CustomPlayer(score_fn=game_agent.improved_salt_score)
+            board = random_board(7, 7, 2, player_1, player_2)
+            _, _, outcome = board.play(time_limit=150)
+            self.assertNotEqual(outcome, "timeout")
+
+    def test_fast_minimax(self):
+        """ Test minimax over a BitBoard (with transpositions) agrees with the reference search """
+        random.seed(6)
+        for _ in range(10):
+            agentUT = game_agent.CustomPlayer(
+                score_fn=game_agent.fast_improved_score, iterative=False, method='minimax')
+            agentUT.time_left = lambda: 1e3
+            board = random_board(7, 7, random.randint(2, 20), agentUT)
+            bits = game_agent.BitBoard.from_board(board)
+            maximize = board.active_player == agentUT
+
+            for depth in range(1, 5):
+                expect, _ = agentUT.minimax(board, depth, maximize=maximize)
+                score, _ = agentUT.minimax(bits, depth, maximize=maximize)
+                self.assertEqual(score, expect)
+
+
+if __name__ == '__main__':
+    unittest.main()
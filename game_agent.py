@@ -1,11 +1,31 @@
 
 
+import gc
+import itertools
 import random
 
+from collections import defaultdict, OrderedDict
+from isolation import Board
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 
 MAX_VAL = float("inf")
 MIN_VAL = float("-inf")
 
+# A fixed table of random noise for 'spicing' scores, cycled through rather
+# than drawing a fresh random number at every leaf.
+NOISE = [random.random() for _ in range(1 << 12)]
+next_noise = itertools.cycle(NOISE).__next__
+
 
 def custom_score(game, player):
     """
@@ -13,6 +33,11 @@ def custom_score(game, player):
     board from the perspective of each player, based on the find_accessible
     function below.  Greater accessibility for the player and lower
     accessibility for their opponent increase the score.
+    
+    Both ratings are computed together by find_accessibility_pair, which
+    floods from each player's position in a single pass.  States where the
+    player to move has no legal moves are scored as a win or loss outright,
+    without flood-filling at all.
 
     Parameters
     ----------
@@ -29,64 +54,274 @@ def custom_score(game, player):
     float
         The computed score for the current game state.
     """
-    player_rating, player_explored = find_accessible(game, player, 5)
+    board = as_bitboard(game)
+    if not board.legal_mask():
+        return MIN_VAL if board.active_player == player else MAX_VAL
+    
+    player_rating, oppose_rating = find_accessibility_pair(board, player, 5)
     if player_rating == 0:
         return MIN_VAL
-    
-    oppose_rating, oppose_explored = find_accessible(game, game.get_opponent(player), 5)
     if oppose_rating == 0:
         return MAX_VAL
     
     spice = 1
     score = player_rating - oppose_rating
     
-    if game.active_player == player:
-        score += random.random() * spice
+    if board.active_player == player:
+        score += next_noise() * spice
     
     return score
 
 
+ACCESS_CACHE = {}
+ACCESS_CACHE_SIZE = 1 << 16
+
+
 def find_accessible(game, player, max_generation):
     """
     Finds and returns all points on the board currently accessible from the
-    player's position, together with an aggregate score that gives diminishing
-    returns with the number of steps needed to reach there.
+    player's position (as a bitmask of squares, see BitBoard below), together
+    with an aggregate score that gives diminishing returns with the number of
+    steps needed to reach there.
     (The max_generation argument limits how far the flood-fill will extend to
     help avoid timeouts.)
+    
+    The flood-fill itself runs over a bitboard (see flood_fill below), and
+    is compiled with numba when that is installed and the board fits within
+    a signed 64-bit int.  Otherwise results are memoized in ACCESS_CACHE,
+    since the search reaches the same states repeatedly: a fixed number of
+    slots, each simply overwritten on store.
     """
-    explored = set()
-    position = game.get_player_location(player)
-    if position == None:
-        return 0, explored
+    board = as_bitboard(game)
+    position = board.player_square(player)
+    if position == NO_SQUARE:
+        return 0, 0
+    
+    geometry = board.geometry
+    if flood_fill_jit is not None and geometry.shift_masks_u64 is not None:
+        access_rating, explored = flood_fill_jit(
+            board.blocked, position, max_generation,
+            geometry.shift_offsets_i64, geometry.shift_masks_u64
+        )
+        return access_rating, int(explored)
+    
+    # (The same squares index different points on boards of another size.)
+    key = (board.blocked, position, max_generation, geometry.width, geometry.height)
+    slot = hash(key) & (ACCESS_CACHE_SIZE - 1)
+    entry = ACCESS_CACHE.get(slot)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    
+    result = flood_fill(board.blocked, position, max_generation, geometry.knight_shifts)
+    ACCESS_CACHE[slot] = (key, result)
+    return result
+
+
+def find_accessibility_pair(game, player, max_generation):
+    """
+    Returns the accessibility ratings (as per find_accessible) of the given
+    player and their opponent, flood-filling for both at once where neither
+    rating has already been computed and cached.  (With numba, both floods
+    are run by a single compiled call instead.)
+    """
+    board = as_bitboard(game)
+    position, other_position = board.player_squares(player)
+    geometry = board.geometry
+    
+    if NO_SQUARE in (position, other_position):
+        return (find_accessible(board, player, max_generation)[0],
+                find_accessible(board, board.get_opponent(player), max_generation)[0])
+    
+    if dual_flood_fill_jit is not None and geometry.shift_masks_u64 is not None:
+        return dual_flood_fill_jit(
+            board.blocked, position, other_position, max_generation,
+            geometry.shift_offsets_i64, geometry.shift_masks_u64
+        )
     
-    directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                  (1, -2),  (1, 2), (2, -1),  (2, 1)]
-    frontier = [position]
+    key = (board.blocked, position, other_position, max_generation, geometry.width, geometry.height)
+    slot = hash(key) & (ACCESS_CACHE_SIZE - 1)
+    entry = ACCESS_CACHE.get(slot)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    
+    result = dual_flood_fill(board.blocked, position, other_position, max_generation, geometry)
+    ACCESS_CACHE[slot] = (key, result)
+    return result
+
+
+def flood_fill(blocked, start, max_generation, knight_shifts):
+    """
+    Flood-fills outward from the start square over the unblocked squares of a
+    bitboard, returning the accessibility rating described in find_accessible
+    along with the bitmask of squares explored.  Each generation is expanded
+    by shifting the whole frontier by each knight-move offset (having masked
+    off squares whose move would leave the board, see BoardGeometry) and
+    masking off anything already blocked or explored.
+    """
+    unblocked = ~blocked
+    explored = 0
+    frontier = 1 << start
     access_rating = 1
     generation = 1
     
-    while len(frontier) > 0 and generation <= max_generation:
-        new_frontier = []
-        
-        for point in frontier:
-            for direction in directions:
-                new_x = point[0] + direction[0]
-                new_y = point[1] + direction[1]
-                new_point = (new_x, new_y)
-                if not game.move_is_legal(new_point):
-                    continue
-                if new_point in explored:
-                    continue
-                explored.add(new_point)
-                new_frontier.append(new_point)
-                access_rating += 1. / generation
-        
-        frontier = new_frontier
+    while frontier and generation <= max_generation:
+        reached = 0
+        for offset, mask in knight_shifts:
+            if offset > 0:
+                reached |= (frontier & mask) << offset
+            else:
+                reached |= (frontier & mask) >> -offset
+        
+        frontier = reached & unblocked & ~explored
+        explored |= frontier
+        access_rating += popcount(frontier) / generation
         generation += 1
     
     return access_rating, explored
 
 
+def dual_flood_fill(blocked, start, other_start, max_generation, geometry):
+    """
+    Runs flood_fill from two start squares at once, returning the
+    accessibility rating from each.  The two floods are held side by side in
+    a single int, the second shifted up by the number of squares on the
+    board, so that each shift and mask applies to both: a knight move from a
+    square in either half always lands in the same half, since moves that
+    would leave the board are masked off first.
+    """
+    num_squares = geometry.num_squares
+    board_mask = geometry.board_mask
+    unblocked = ~blocked & board_mask
+    unblocked |= unblocked << num_squares
+    explored = 0
+    frontier = (1 << start) | (1 << (other_start + num_squares))
+    access_rating = other_rating = 1
+    generation = 1
+    
+    while frontier and generation <= max_generation:
+        reached = 0
+        for offset, mask in geometry.dual_knight_shifts:
+            if offset > 0:
+                reached |= (frontier & mask) << offset
+            else:
+                reached |= (frontier & mask) >> -offset
+        
+        frontier = reached & unblocked & ~explored
+        explored |= frontier
+        access_rating += popcount(frontier & board_mask) / generation
+        other_rating += popcount(frontier >> num_squares) / generation
+        generation += 1
+    
+    return access_rating, other_rating
+
+
+def _flood_fill_uint64(blocked, start, max_generation, shift_offsets, shift_masks):
+    """
+    Implements flood_fill for numba compilation.  Rather than looking up the
+    knight-move mask of each frontier square, each generation shifts the
+    whole frontier by each of the eight knight-move offsets, having first
+    masked off the squares whose move in that direction would leave the
+    board (see BoardGeometry.knight_shifts.)  Left shifts are given as
+    positive offsets and right shifts as negative.
+    
+    Bitboards are passed in and out as (cheaper to box) int64 values, but
+    held as uint64 internally, since mixing signed and unsigned ints in
+    numba would give floats.
+    """
+    blocked = np.uint64(blocked)
+    one = np.uint64(1)
+    unblocked = ~blocked
+    explored = np.uint64(0)
+    frontier = one << np.uint64(start)
+    access_rating = 1.
+    generation = 1
+    
+    while frontier != 0 and generation <= max_generation:
+        reached = np.uint64(0)
+        for i in range(8):
+            offset = shift_offsets[i]
+            if offset > 0:
+                reached |= (frontier & shift_masks[i]) << np.uint64(offset)
+            else:
+                reached |= (frontier & shift_masks[i]) >> np.uint64(-offset)
+        
+        frontier = reached & unblocked & ~explored
+        explored |= frontier
+        count = 0
+        bits = frontier
+        while bits != 0:
+            bits &= bits - one
+            count += 1
+        access_rating += count / generation
+        generation += 1
+    
+    return access_rating, np.int64(explored)
+
+
+def _dual_flood_fill_uint64(blocked, start, other_start, max_generation,
+                            shift_offsets, shift_masks):
+    """
+    Implements dual_flood_fill for numba compilation, as per
+    _flood_fill_uint64 above.  (Both floods can't share one uint64, so each
+    keeps its own frontier, but they are advanced in the same loop.)
+    """
+    blocked = np.uint64(blocked)
+    one = np.uint64(1)
+    unblocked = ~blocked
+    explored = other_explored = np.uint64(0)
+    frontier = one << np.uint64(start)
+    other_frontier = one << np.uint64(other_start)
+    access_rating = other_rating = 1.
+    generation = 1
+    
+    while (frontier != 0 or other_frontier != 0) and generation <= max_generation:
+        reached = other_reached = np.uint64(0)
+        for i in range(8):
+            offset = shift_offsets[i]
+            mask = shift_masks[i]
+            if offset > 0:
+                reached |= (frontier & mask) << np.uint64(offset)
+                other_reached |= (other_frontier & mask) << np.uint64(offset)
+            else:
+                reached |= (frontier & mask) >> np.uint64(-offset)
+                other_reached |= (other_frontier & mask) >> np.uint64(-offset)
+        
+        frontier = reached & unblocked & ~explored
+        other_frontier = other_reached & unblocked & ~other_explored
+        explored |= frontier
+        other_explored |= other_frontier
+        count = other_count = 0
+        bits = frontier
+        while bits != 0:
+            bits &= bits - one
+            count += 1
+        bits = other_frontier
+        while bits != 0:
+            bits &= bits - one
+            other_count += 1
+        access_rating += count / generation
+        other_rating += other_count / generation
+        generation += 1
+    
+    return access_rating, other_rating
+
+
+# The kernels are compiled for explicit signatures, so that compilation (or
+# loading from numba's on-disk cache) happens at import rather than on the
+# first call, which would otherwise land inside a timed move.
+if njit is not None:
+    flood_fill_jit = njit(
+        "Tuple((float64, int64))(int64, int64, int64, int64[::1], uint64[::1])",
+        cache=True, fastmath=True
+    )(_flood_fill_uint64)
+    dual_flood_fill_jit = njit(
+        "Tuple((float64, float64))(int64, int64, int64, int64, int64[::1], uint64[::1])",
+        cache=True, fastmath=True
+    )(_dual_flood_fill_uint64)
+else:
+    flood_fill_jit = dual_flood_fill_jit = None
+
+
 def reflect_score(game, player):
     """
     Returns a game-state heuristic based on some of the winning gambits
@@ -115,7 +350,7 @@ def reflect_score(game, player):
     
     opponent = game.get_opponent(player)
     wide, high = game.width, game.height
-    centre = (int(wide / 2), int(high / 2))
+    centre = board_geometry(wide, high).centre
     own_pos = game.get_player_location(player)
     opp_pos = game.get_player_location(opponent)
     max_score = wide * high
@@ -123,7 +358,7 @@ def reflect_score(game, player):
     if game.move_count <= 2:
         if opp_pos == None:
             return max_score if own_pos == centre else 0
-        elif own_pos in game.get_legal_moves(opponent) and opp_pos == centre:
+        elif opp_pos == centre and own_pos in game.get_legal_moves(opponent):
             return -max_score
     
     elif player == game.__player_1__:
@@ -156,23 +391,48 @@ def improved_salt_score(game, player):
     float
         The computed score for the current game state.
     """
-    if game.is_loser(player):
+    own_turn = game.active_player == player
+    own_moves = count_moves(game, player)
+    if own_turn and own_moves == 0:
         return MIN_VAL
     
-    if game.is_winner(player):
+    opp_moves = count_moves(game, game.get_opponent(player))
+    if not own_turn and opp_moves == 0:
         return MAX_VAL
     
-    own_moves = len(game.get_legal_moves(player))
-    opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
     spice = 1
     score = own_moves - opp_moves
     
-    if game.active_player == player:
-        score += random.random() * spice
+    if own_turn:
+        score += next_noise() * spice
     
     return score
 
 
+def improved_salt_batch(game, player, moves):
+    """
+    Returns the improved_salt_score of the state following each of the given
+    moves (as square indices) by the active player of a BitBoard, without
+    applying any of them.  Used by the search to score all the leaves below
+    a node at once (see batch_improved below.)  Both players must already
+    have been placed.
+    """
+    own_turn = game.active_player != player
+    own_counts, opp_counts = batch_leaf_moves(game, player, moves)
+    
+    scores = []
+    for own_moves, opp_moves in zip(own_counts, opp_counts):
+        if own_turn and own_moves == 0:
+            scores.append(MIN_VAL)
+        elif not own_turn and opp_moves == 0:
+            scores.append(MAX_VAL)
+        elif own_turn:
+            scores.append(own_moves - opp_moves + next_noise())
+        else:
+            scores.append(own_moves - opp_moves)
+    return scores
+
+
 
 """
 Assorted directional constants used during rotations (see below.)
@@ -185,15 +445,29 @@ WEST   = 3
 DIAG_1 = 4
 DIAG_2 = 5
 HORIZ  = 6
-VERT   = 8
+VERT   = 7
 RECT_ROTATIONS = [NORTH, SOUTH, HORIZ, VERT]
 
+# For each rotation above, whether x and y are swapped, and then whether
+# each is flipped within the board.
+ROTATION_TABLE = [
+    (False, False, False),
+    (True,  False, True ),
+    (False, True,  True ),
+    (True,  True,  False),
+    (True,  False, False),
+    (True,  True,  True ),
+    (False, True,  False),
+    (False, False, True ),
+]
+
 
 def custom_cached_score(game, player):
     """
     Returns a game-state heuristic based on the custom_score heuristic, but
     that attempts to cache score-values based on the current board-layout
-    under various symmetries.
+    under various symmetries.  The cache holds up to MAX_CACHE_SIZE keys,
+    evicting the least recently used first.
     
     Parameters
     ----------
@@ -210,22 +484,26 @@ def custom_cached_score(game, player):
     float
         The computed score for the current game state.
     """
-    depth_okay = game.move_count < player.MAX_CACHE_DEPTH
-    if depth_okay:
-        key = hash_key(game, NORTH)
-        if key in player.score_cache:
-            player.cache_hits += 1
-            return player.score_cache[key]
+    score_cache = player.score_cache
+    key = hash_key(game, NORTH)
+    score = score_cache.get(key)
+    if score is not None:
+        score_cache.move_to_end(key)
+        player.cache_hits += 1
+        return score
     
     score = custom_score(game, player)
     player.cache_misses += 1
     
-    if depth_okay and len(player.score_cache) < player.MAX_CACHE_SIZE:
-        keys = [hash_key(game, rotation) for rotation in RECT_ROTATIONS]
-        if CACHE_VERBOSE and player.cache_misses % 1000 == 0:
-            print("Cached keys for board were: ", keys)
-        for rotated_key in keys:
-            player.score_cache[rotated_key] = score
+    # (Boards that are symmetric under some rotation give the same key
+    # more than once, so each distinct key is only stored once.)
+    keys = set(hash_key(game, rotation) for rotation in RECT_ROTATIONS)
+    if CACHE_VERBOSE and player.cache_misses % 1000 == 0:
+        print("Cached keys for board were: ", keys)
+    for rotated_key in keys:
+        score_cache[rotated_key] = score
+    while len(score_cache) > player.MAX_CACHE_SIZE:
+        score_cache.popitem(last=False)
     
     return score
 
@@ -243,28 +521,29 @@ def hash_key(game, rotation):
         game (e.g., player locations and blocked cells).
     
     rotation : { NORTH, SOUTH, EAST, WEST, DIAG_1, DIAG_2, HORIZ, VERT }
-        A rotation to apply to internal x/y coordinates.
+        A rotation to apply to internal x/y coordinates.  (Only NORTH, SOUTH,
+        HORIZ and VERT are available for non-square boards.)
 
     Returns
     -------
-    str
-        A string-hash-key based on appending together player coordinates and
-        those of any occupied spaces.
+    int
+        The 64-bit Zobrist hash of the rotated board (see BoardGeometry),
+        combining keys for each occupied space and the players' positions.
     """
-    x1, y1 = game.get_player_location(game.__player_1__)
-    x2, y2 = game.get_player_location(game.__player_2__)
-    x1, y1 = (rotate_coord(game, x1, y1, rotation))
-    x2, y2 = (rotate_coord(game, x2, y2, rotation))
-    key = [x1, y1, x2, y2]
-    
-    for x in range(game.width):
-        for y in range(game.height):
-            x, y = rotate_coord(game, x, y, rotation)
-            if game.__board_state__[x][y] != game.BLANK:
-                key.append(x)
-                key.append(y)
+    board = as_bitboard(game)
+    geometry = board.geometry
+    shift = geometry.zobrist_lanes.get(rotation)
+    if shift is not None:
+        return (board.zobrist >> shift) & ZOBRIST_MASK
     
-    return str(key)
+    rotate = geometry.symmetries[rotation]
+    zobrist_blocked = geometry.zobrist_blocked
+    key = geometry.zobrist_p1[rotate[board.p1_sq]] ^ geometry.zobrist_p2[rotate[board.p2_sq]]
+    for sq in bit_squares(board.blocked):
+        key ^= zobrist_blocked[rotate[sq]]
+    if board.active:
+        key ^= geometry.zobrist_side
+    return key & ZOBRIST_MASK
 
 
 def rotate_coord(game, x, y, rotation):
@@ -291,26 +570,13 @@ def rotate_coord(game, x, y, rotation):
     (int, int)
         The given board coordinates under the appropriate rotation.
     """
-    off_h = game.width  - 1
-    off_v = game.height - 1
-    
-    if (rotation == NORTH):
-        pass
-    if (rotation == SOUTH):
-        x, y = off_h - x, off_v - y
-    if (rotation == EAST):
-        x, y = y, off_h - x
-    if (rotation == WEST):
-        x, y = off_v - y, x
-    if (rotation == HORIZ):
-        x, y = off_h - x, y
-    if (rotation == VERT):
-        x, y = x, off_v - y
-    if (rotation == DIAG_1):
-        x, y = y, x
-    if (rotation == DIAG_2):
-        x, y = off_v - y, off_h - x
-    return x, y
+    swap, flip_x, flip_y = ROTATION_TABLE[rotation]
+    off_x = game.width  - 1
+    off_y = game.height - 1
+    
+    if swap:
+        x, y, off_x, off_y = y, x, off_y, off_x
+    return (off_x - x if flip_x else x), (off_y - y if flip_y else y)
 
 
 
@@ -335,17 +601,548 @@ def fast_improved_score(game, player):
         The computed score for the current game state.
     """
     opponent = game.get_opponent(player)
-    own_moves = len(game.get_legal_moves(player))
+    own_moves = count_moves(game, player)
     if own_moves == 0:
         return MIN_VAL
     
-    opp_moves = len(game.get_legal_moves(opponent))
+    opp_moves = count_moves(game, opponent)
     if opp_moves == 0:
         return MAX_VAL
     
     return own_moves - opp_moves
 
 
+def fast_improved_batch(game, player, moves):
+    """
+    Returns the fast_improved_score of the state following each of the given
+    moves (as square indices) by the active player of a BitBoard, as per
+    improved_salt_batch above.
+    """
+    own_counts, opp_counts = batch_leaf_moves(game, player, moves)
+    
+    scores = []
+    for own_moves, opp_moves in zip(own_counts, opp_counts):
+        if own_moves == 0:
+            scores.append(MIN_VAL)
+        elif opp_moves == 0:
+            scores.append(MAX_VAL)
+        else:
+            scores.append(own_moves - opp_moves)
+    return scores
+
+
+def batch_leaf_moves(game, player, moves):
+    """
+    Returns the number of legal moves available to the given player and to
+    their opponent in the state following each of the given moves by the
+    active player of a BitBoard, as two lists (see batch_improved below.)
+    A node has at most eight such leaves, so these are counted with plain
+    ints rather than arrays.
+    """
+    waiting_sq = game.p2_sq if game.active == 0 else game.p1_sq
+    blocked = [game.blocked | (1 << move) for move in moves]
+    if game.active_player != player:
+        return batch_improved(blocked, [waiting_sq] * len(moves), moves, game.geometry)
+    return batch_improved(blocked, moves, [waiting_sq] * len(moves), game.geometry)
+
+
+
+"""
+Bitboard versions of the board-state used during search.  Every square of the
+board is assigned a single bit (square = row * width + col), so that the set
+of blocked cells fits in a single int and the legal moves from any square are
+just a precomputed knight-move mask with the blocked cells removed.
+"""
+KNIGHT_DIRECTIONS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                     (1, -2),  (1, 2), (2, -1),  (2, 1))
+NO_SQUARE = -1
+ZOBRIST_SEED = 0x150
+ZOBRIST_MASK = (1 << 64) - 1
+
+
+class BoardGeometry(object):
+    """
+    Lookup tables shared by every bitboard of a given width and height:
+    the (row, col) move corresponding to each square (and vice versa), the
+    centre point used by reflect_score, the mask of squares a knight can
+    reach from each square without leaving the board, and the random 64-bit
+    Zobrist keys used to hash board states.
+    
+    Each Zobrist key is made up of four 64-bit 'lanes', holding the keys of
+    the squares it maps to under each of RECT_ROTATIONS in turn (starting
+    with NORTH, the identity, in the lowest 64 bits.)  Hashes built from them
+    thus hold the hash of each rotated board alongside, at no extra cost.
+    The smallest of these serves as a transposition-table key shared by a
+    board and its 180-degree rotation and reflections (for score functions
+    that rate them all the same- see SYMMETRIC_SCORES.)
+    
+    Since off-board destinations never appear in any mask, legality checks
+    reduce to AND-ing a mask with the unblocked squares, with no bounds
+    checks needed.
+    """
+    
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.num_squares = width * height
+        self.board_mask = (1 << self.num_squares) - 1
+        self.moves = [(row, col) for row in range(height) for col in range(width)]
+        self.squares = dict((move, sq) for sq, move in enumerate(self.moves))
+        self.centre = (int(width / 2), int(height / 2))
+        self.mask_squares = {}
+        self.knight_masks = []
+        
+        for row, col in self.moves:
+            mask = 0
+            for dr, dc in KNIGHT_DIRECTIONS:
+                if 0 <= row + dr < height and 0 <= col + dc < width:
+                    mask |= 1 << ((row + dr) * width + col + dc)
+            self.knight_masks.append(mask)
+        
+        # Each knight move is also a fixed shift of the square index, valid
+        # from any square whose move in that direction stays on the board.
+        self.knight_shifts = []
+        for dr, dc in KNIGHT_DIRECTIONS:
+            mask = 0
+            for sq, (row, col) in enumerate(self.moves):
+                if 0 <= row + dr < height and 0 <= col + dc < width:
+                    mask |= 1 << sq
+            self.knight_shifts.append((dr * width + dc, mask))
+        self.dual_knight_shifts = [(offset, mask | (mask << self.num_squares))
+                                   for offset, mask in self.knight_shifts]
+        
+        # Compiled flood-fills need the shifts as int64/uint64 arrays.
+        self.shift_offsets_i64 = self.shift_masks_u64 = None
+        if np is not None and self.num_squares < 64:
+            self.shift_offsets_i64 = np.array([offset for offset, _ in self.knight_shifts], dtype=np.int64)
+            self.shift_masks_u64 = np.array([mask for _, mask in self.knight_shifts], dtype=np.uint64)
+        
+        # Searches report 'no move' as NO_SQUARE (-1), which this last entry
+        # translates into the (-1, -1) move expected by callers.
+        self.moves.append((-1, -1))
+        
+        # The square each square maps to under each of the board's symmetries
+        # (as per rotate_coord, with x as the column and y as the row.)
+        # Rotating by 180 degrees simply reverses the order of the squares.
+        # (NO_SQUARE is left unchanged by the extra entry at the end.)
+        rotations = RECT_ROTATIONS
+        if width == height:
+            rotations = [NORTH, EAST, SOUTH, WEST, DIAG_1, DIAG_2, HORIZ, VERT]
+        self.symmetries = {}
+        for rotation in rotations:
+            rotated = [rotate_coord(self, col, row, rotation) for row, col in self.moves[:-1]]
+            self.symmetries[rotation] = [row * width + col for col, row in rotated] + [NO_SQUARE]
+        
+        # The symmetries for each Zobrist lane after the first (see below.)
+        self.lane_symmetries = [self.symmetries[rotation] for rotation in RECT_ROTATIONS[1:]]
+        
+        # The player tables carry one extra (zero) entry at the end, so that
+        # indexing them with NO_SQUARE (-1) leaves a hash unchanged.
+        rng = random.Random(ZOBRIST_SEED)
+        self.zobrist_lanes = dict((rotation, 64 * lane) for lane, rotation in enumerate(RECT_ROTATIONS))
+        
+        def keys(extra):
+            base = [rng.getrandbits(64) for _ in range(self.num_squares)]
+            return [sum(base[self.symmetries[rotation][sq]] << shift
+                        for rotation, shift in self.zobrist_lanes.items())
+                    for sq in range(self.num_squares)] + extra
+        
+        self.zobrist_blocked = keys([])
+        self.zobrist_p1 = keys([0])
+        self.zobrist_p2 = keys([0])
+        side = rng.getrandbits(64)
+        self.zobrist_side = sum(side << shift for shift in self.zobrist_lanes.values())
+
+
+GEOMETRIES = {}
+
+
+def board_geometry(width, height):
+    """
+    Returns the (lazily constructed) BoardGeometry for the given board size.
+    """
+    geometry = GEOMETRIES.get((width, height))
+    if geometry is None:
+        geometry = GEOMETRIES[(width, height)] = BoardGeometry(width, height)
+    return geometry
+
+
+board_geometry(7, 7)
+
+
+def bit_squares(mask):
+    """
+    Iterates over the squares set in the given bitmask, lowest first.
+    """
+    while mask:
+        bit = mask & -mask
+        yield bit.bit_length() - 1
+        mask ^= bit
+
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(mask):
+        """
+        Returns the number of bits set in the given mask.
+        """
+        return bin(mask).count('1')
+
+
+def batch_improved(blocked, own_squares, opp_squares, geometry):
+    """
+    Counts the legal moves available to each player over a batch of board
+    states, given as parallel sequences of blocked-square bitmasks and the
+    squares of each player.  Returns a pair of lists of counts.
+    """
+    knight_masks = geometry.knight_masks
+    own_counts = [popcount(knight_masks[sq] & ~mask) for sq, mask in zip(own_squares, blocked)]
+    opp_counts = [popcount(knight_masks[sq] & ~mask) for sq, mask in zip(opp_squares, blocked)]
+    return own_counts, opp_counts
+
+
+def count_moves(game, player):
+    """
+    Returns the number of legal moves available to the given player, which
+    for a BitBoard is just the popcount of their legal-move mask.
+    """
+    if isinstance(game, BitBoard):
+        return popcount(game.legal_mask(player))
+    return len(game.get_legal_moves(player))
+
+
+def as_bitboard(game):
+    """
+    Returns the given game if it is already a BitBoard, or a BitBoard copy of
+    its current state otherwise.
+    """
+    if isinstance(game, BitBoard):
+        return game
+    return BitBoard.from_board(game)
+
+
+class BitBoard(object):
+    """
+    Implements the same read-and-forecast interface as `isolation.Board`, but
+    stores the game state as a few ints instead of a list-of-lists, so that
+    legality checks, move generation and forecasting are all a handful of
+    bit operations.
+    
+    Parameters
+    ----------
+    player_1 : object
+        The object registered as the first player.
+    
+    player_2 : object
+        The object registered as the second player.
+    
+    width : int (optional)
+        The number of columns that the board should have.
+    
+    height : int (optional)
+        The number of rows that the board should have.
+    """
+    __slots__ = (
+        'width', 'height', 'geometry', 'move_count', '__player_1__', '__player_2__',
+        'blocked', 'p1_sq', 'p2_sq', 'active', 'zobrist', 'undo_stack'
+    )
+    
+    BLANK = Board.BLANK
+    NOT_MOVED = Board.NOT_MOVED
+    
+    def __init__(self, player_1, player_2, width=7, height=7):
+        self.width = width
+        self.height = height
+        self.geometry = board_geometry(width, height)
+        self.move_count = 0
+        self.__player_1__ = player_1
+        self.__player_2__ = player_2
+        self.blocked = 0
+        self.p1_sq = NO_SQUARE
+        self.p2_sq = NO_SQUARE
+        self.active = 0
+        self.zobrist = 0
+        self.undo_stack = []
+    
+    
+    @classmethod
+    def from_board(cls, board):
+        """
+        Returns a BitBoard encoding the same game state as the given
+        `isolation.Board`.
+        """
+        player_1, player_2 = board.__player_1__, board.__player_2__
+        bits = cls(player_1, player_2, board.width, board.height)
+        bits.move_count = board.move_count
+        bits.active = 0 if board.active_player == player_1 else 1
+        bits.p1_sq = bits.square(board.get_player_location(player_1))
+        bits.p2_sq = bits.square(board.get_player_location(player_2))
+        
+        for row, cells in enumerate(board.__board_state__):
+            for col, cell in enumerate(cells):
+                if cell != Board.BLANK:
+                    bits.blocked |= 1 << (row * board.width + col)
+        
+        bits.zobrist = bits.compute_zobrist()
+        return bits
+    
+    
+    def compute_zobrist(self):
+        """
+        Computes the Zobrist hash of the current state from scratch (see
+        apply_move for the incremental version.)
+        """
+        geometry = self.geometry
+        key = geometry.zobrist_p1[self.p1_sq] ^ geometry.zobrist_p2[self.p2_sq]
+        for sq in bit_squares(self.blocked):
+            key ^= geometry.zobrist_blocked[sq]
+        if self.active:
+            key ^= geometry.zobrist_side
+        return key
+    
+    
+    def square(self, move):
+        """
+        Returns the square index for a (row, col) move, or NO_SQUARE for an
+        unplaced player.
+        """
+        if move == Board.NOT_MOVED:
+            return NO_SQUARE
+        return move[0] * self.width + move[1]
+    
+    
+    @property
+    def active_player(self):
+        return self.__player_1__ if self.active == 0 else self.__player_2__
+    
+    
+    @property
+    def inactive_player(self):
+        return self.__player_2__ if self.active == 0 else self.__player_1__
+    
+    
+    @property
+    def __board_state__(self):
+        """
+        Reconstructs the list-of-lists board layout used by `isolation.Board`
+        (for any code that still inspects it directly.)
+        """
+        state = [[Board.BLANK] * self.width for _ in range(self.height)]
+        for sq in bit_squares(self.blocked):
+            row, col = self.geometry.moves[sq]
+            state[row][col] = -1  # blocked, but the owner is not recorded
+        for sq, symbol in ((self.p1_sq, 1), (self.p2_sq, 2)):
+            if sq != NO_SQUARE:
+                row, col = self.geometry.moves[sq]
+                state[row][col] = symbol
+        return state
+    
+    
+    def get_opponent(self, player):
+        if player == self.__player_1__:
+            return self.__player_2__
+        elif player == self.__player_2__:
+            return self.__player_1__
+        raise RuntimeError("`player` must be an object registered as a player in the current game.")
+    
+    
+    def player_square(self, player):
+        """
+        Returns the square occupied by the given player (or NO_SQUARE.)
+        """
+        if player == self.__player_1__:
+            return self.p1_sq
+        elif player == self.__player_2__:
+            return self.p2_sq
+        raise RuntimeError("`player` must be an object registered as a player in the current game.")
+    
+    
+    def player_squares(self, player):
+        """
+        Returns the squares occupied by the given player and by their
+        opponent, as a pair (either of which may be NO_SQUARE.)
+        """
+        if player == self.__player_1__:
+            return self.p1_sq, self.p2_sq
+        elif player == self.__player_2__:
+            return self.p2_sq, self.p1_sq
+        raise RuntimeError("`player` must be an object registered as a player in the current game.")
+    
+    
+    def copy(self):
+        new_board = BitBoard.__new__(BitBoard)
+        new_board.width = self.width
+        new_board.height = self.height
+        new_board.geometry = self.geometry
+        new_board.move_count = self.move_count
+        new_board.__player_1__ = self.__player_1__
+        new_board.__player_2__ = self.__player_2__
+        new_board.blocked = self.blocked
+        new_board.p1_sq = self.p1_sq
+        new_board.p2_sq = self.p2_sq
+        new_board.active = self.active
+        new_board.zobrist = self.zobrist
+        new_board.undo_stack = []
+        return new_board
+    
+    
+    def forecast_move(self, move):
+        new_board = self.copy()
+        new_board.apply_move(move)
+        return new_board
+    
+    
+    def move_is_legal(self, move):
+        sq = self.geometry.squares.get(move)
+        return sq is not None and not (self.blocked >> sq) & 1
+    
+    
+    def get_blank_spaces(self):
+        moves, blocked = self.geometry.moves, self.blocked
+        return [moves[row * self.width + col]
+                for col in range(self.width) for row in range(self.height)
+                if not (blocked >> (row * self.width + col)) & 1]
+    
+    
+    def get_player_location(self, player):
+        sq = self.player_square(player)
+        return Board.NOT_MOVED if sq == NO_SQUARE else self.geometry.moves[sq]
+    
+    
+    def legal_mask(self, player=None):
+        """
+        Returns the bitmask of squares the given player (by default the active
+        player) could move to.  Unplaced players may move to any blank square.
+        """
+        if player is None:
+            sq = self.p1_sq if self.active == 0 else self.p2_sq
+        else:
+            sq = self.player_square(player)
+        if sq == NO_SQUARE:
+            return self.geometry.board_mask & ~self.blocked
+        return self.geometry.knight_masks[sq] & ~self.blocked
+    
+    
+    def get_legal_moves(self, player=None):
+        if player is None:
+            player = self.active_player
+        if self.player_square(player) == NO_SQUARE:
+            return self.get_blank_spaces()
+        moves = self.geometry.moves
+        return [moves[sq] for sq in self.legal_squares(player)]
+    
+    
+    def legal_squares(self, player=None):
+        """
+        Returns a tuple of the squares the given player (by default the active
+        player) could move to, lowest first.  These are memoized in the
+        geometry by legal-move mask: a placed player's mask is always a subset
+        of a single knight-move mask (of at most 8 squares), and unplaced
+        players only occur on a blank or single-move board, so there are at
+        most a few thousand distinct masks per board size.
+        """
+        mask = self.legal_mask(player)
+        mask_squares = self.geometry.mask_squares
+        squares = mask_squares.get(mask)
+        if squares is None:
+            squares = mask_squares[mask] = tuple(bit_squares(mask))
+        return squares
+    
+    
+    def apply_move(self, move):
+        self.push(move[0] * self.width + move[1])
+    
+    
+    def push(self, sq):
+        """
+        Moves the active player to the given square in place, recording the
+        change so that it can be reverted by pop().  (Copies of the board
+        start with an empty undo-stack.)
+        """
+        geometry = self.geometry
+        if self.active == 0:
+            prev_sq = self.p1_sq
+            self.zobrist ^= geometry.zobrist_p1[prev_sq] ^ geometry.zobrist_p1[sq]
+            self.p1_sq = sq
+        else:
+            prev_sq = self.p2_sq
+            self.zobrist ^= geometry.zobrist_p2[prev_sq] ^ geometry.zobrist_p2[sq]
+            self.p2_sq = sq
+        self.zobrist ^= geometry.zobrist_blocked[sq] ^ geometry.zobrist_side
+        self.blocked |= 1 << sq
+        self.active ^= 1
+        self.move_count += 1
+        self.undo_stack.append((sq, prev_sq))
+    
+    
+    def pop(self):
+        """
+        Reverts the last move applied by push().
+        """
+        sq, prev_sq = self.undo_stack.pop()
+        geometry = self.geometry
+        self.move_count -= 1
+        self.active ^= 1
+        self.blocked ^= 1 << sq
+        self.zobrist ^= geometry.zobrist_blocked[sq] ^ geometry.zobrist_side
+        if self.active == 0:
+            self.zobrist ^= geometry.zobrist_p1[prev_sq] ^ geometry.zobrist_p1[sq]
+            self.p1_sq = prev_sq
+        else:
+            self.zobrist ^= geometry.zobrist_p2[prev_sq] ^ geometry.zobrist_p2[sq]
+            self.p2_sq = prev_sq
+    
+    
+    def is_winner(self, player):
+        return player == self.inactive_player and not self.legal_mask()
+    
+    
+    def is_loser(self, player):
+        return player == self.active_player and not self.legal_mask()
+    
+    
+    def utility(self, player):
+        if not self.legal_mask():
+            if player == self.inactive_player:
+                return MAX_VAL
+            if player == self.active_player:
+                return MIN_VAL
+        return 0.
+    
+    
+    def to_string(self):
+        out = ''
+        for row in range(self.height):
+            out += ' | '
+            for col in range(self.width):
+                sq = row * self.width + col
+                if not (self.blocked >> sq) & 1:
+                    out += ' '
+                elif sq == self.p1_sq:
+                    out += '1'
+                elif sq == self.p2_sq:
+                    out += '2'
+                else:
+                    out += '-'
+                out += ' | '
+            out += '\n\r'
+        return out
+    
+    
+    def print_board(self):
+        return self.to_string()
+
+
+
+"""
+Bound-types for transposition-table entries, indicating whether the stored
+score is exact or only a lower/upper bound on the true score.
+"""
+TT_EXACT = 0
+TT_LOWER = 1
+TT_UPPER = 2
+
 
 class Timeout(Exception):
     """
@@ -354,21 +1151,45 @@ class Timeout(Exception):
     pass
 
 
+# Score functions with a counterpart that scores every leaf below a BitBoard
+# node in one call (taking the game, player and list of moves.)
+BATCH_SCORES = {
+    improved_salt_score: improved_salt_batch,
+    fast_improved_score: fast_improved_batch
+}
+
+# Score functions that rate any board the same as its 180-degree rotation or
+# its horizontal and vertical reflections (up to their random noise), so that
+# the search may share transposition-table entries between them.
+SYMMETRIC_SCORES = {
+    custom_score,
+    custom_cached_score,
+    improved_salt_score,
+    fast_improved_score
+}
+
+
 class CustomPlayer:
     
-    score_cache = {}
-    MAX_CACHE_DEPTH = 4
+    __slots__ = (
+        'iterative', 'search_depth', 'score', 'method', '_search', 'time_left',
+        'TIMER_THRESHOLD', 'lazy_eval', 'tt', 'last_move_count', 'killers', 'history', 'node_count',
+        'score_cache', 'cache_hits', 'cache_misses',
+        'min_depth_reached', 'search_depth_total', 'num_searches'
+    )
+    
     MAX_CACHE_SIZE = 40000
-    cache_hits = 0
-    cache_misses = 0
     
-    min_depth_reached = -1
-    search_depth_total = 0
-    num_searches = 0
+    TT_SIZE = 1 << 16
+    ASPIRATION_WINDOW = 2.
+    MAX_ASPIRATION_WINDOW = 16.
+    LAZY_EVAL_MARGIN = 2.
+    TIME_CHECK_INTERVAL = 16
+    NULL_WINDOW = 1e-6
     
     
     def __init__(self, search_depth=3, score_fn=custom_score,
-                 iterative=True, method='alphabeta', timeout=10.):
+                 iterative=True, method='alphabeta', timeout=10., lazy_eval=False):
         """
         Game-playing agent that chooses a move using a specified evaluation
         function, depth-limited minimax algorithm, alpha-beta pruning and/or
@@ -396,13 +1217,34 @@ class CustomPlayer:
             Time remaining (in milliseconds) when search is aborted. Should be
             a positive value large enough to allow the function to return
             before the timer expires.
+        
+        lazy_eval : boolean (optional)
+            Flag indicating whether leaf nodes should first be estimated with
+            the cheap 'improved' mobility score, skipping score_fn for leaves
+            that estimate already places well outside the search window.
         """
         self.iterative = iterative
         self.search_depth = -1 if iterative else search_depth
         self.score = score_fn
         self.method = method
+        try:
+            self._search = {'alphabeta': self.alphabeta, 'minimax': self.minimax}[method]
+        except KeyError:
+            raise ValueError("Unknown search method: %r" % (method,))
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.lazy_eval = lazy_eval
+        self.tt = {}
+        self.last_move_count = -1
+        self.killers = defaultdict(lambda: [None, None])
+        self.history = (defaultdict(int), defaultdict(int))
+        self.node_count = 0
+        self.score_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.min_depth_reached = -1
+        self.search_depth_total = 0
+        self.num_searches = 0
     
     
     def get_average_search_depth(self):
@@ -440,26 +1282,78 @@ class CustomPlayer:
             (-1, -1) if there are no available legal moves.
         """
         
+        # A full garbage collection walks every object still alive, including
+        # the transposition table and ACCESS_CACHE kept between moves, and
+        # one landing late in a search can run past the timer.  So collection
+        # is held off while searching (the search's own garbage is still freed
+        # by reference counting), to run between moves instead.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self.choose_move(game, legal_moves, time_left)
+        finally:
+            if gc_enabled:
+                gc.enable()
+    
+    
+    def choose_move(self, game, legal_moves, time_left):
+        """
+        Implements get_move, above, while garbage collection is held off.
+        """
+        
+        # Subclasses of Board may override or instrument its behaviour, so
+        # only the stock Board is swapped out for the faster BitBoard.
+        if type(game) is Board:
+            game = BitBoard.from_board(game)
+
+        # The transposition table and score cache stay valid from one move to
+        # the next, but are cleared at the start of each new game (where the
+        # move count will have gone back down), as this player may not be
+        # playing first in both.
+        if game.move_count <= self.last_move_count:
+            self.tt.clear()
+            self.score_cache.clear()
+        self.last_move_count = game.move_count
+        
         self.time_left = time_left
+        self.node_count = 0
+        self.killers.clear()
+        for history in self.history:
+            history.clear()
         max_depth = self.search_depth
         depth = 1 if self.iterative else max_depth
         best_move = (-1, -1)
+        best_score = None
         max_depth_reached = 0
         
         while max_depth <= 0 or depth <= max_depth:
             
             self.min_depth_reached = depth
             
-            move = self.try_move(game, depth)
+            if best_score is None:
+                result = self.try_move(game, depth)
+            else:
+                result = self.try_aspiration(game, depth, best_score)
             
             search_depth = depth - self.min_depth_reached
             max_depth_reached = max(search_depth, max_depth_reached)
             
-            if move == False:
+            if result is None:
                 break
-            best_move = move
+            best_score = result[0]
+            # A search that proves every move loses (scoring the root
+            # MIN_VAL) picks no move, so the best move found by the previous
+            # iteration is kept instead: an opponent searching less deeply
+            # may not see the win.
+            if result[1] != (-1, -1):
+                best_move = result[1]
             depth += 1
         
+        # Any legal move is better than forfeiting outright where no
+        # iteration picked a move (the first timing out, or proving a loss.)
+        if best_move == (-1, -1) and legal_moves:
+            best_move = legal_moves[0]
+        
         if CACHE_VERBOSE and self.cache_misses > 0:
             print("CACHE HITS/MISSES: ", self.cache_hits, "/", self.cache_misses)
         
@@ -469,25 +1363,48 @@ class CustomPlayer:
         return best_move
     
     
-    def try_move(self, game, depth):
+    def try_move(self, game, depth, lower_bound=MIN_VAL, upper_bound=MAX_VAL):
         """
         Performs a single depth-limited move-search attempt (either once
         within non-iterative or repeatedly within iterative-deepening.)  See
-        get_move, above, for details.
+        get_move, above, for details.  Returns the (rating, move) pair found,
+        or None if the search timed out.
         """
-        move = (-1, -1)
+        rating, move = None, (-1, -1)
         try:
             
-            if self.method == 'minimax':
-                rating, move = self.minimax(game, depth)
-            
-            if self.method == 'alphabeta':
-                rating, move = self.alphabeta(game, depth)
+            if lower_bound == MIN_VAL and upper_bound == MAX_VAL:
+                rating, move = self._search(game, depth)
+            else:
+                rating, move = self.alphabeta(game, depth, lower_bound, upper_bound)
             
         except Timeout:
-            return False
+            return None
         
-        return move
+        return rating, move
+    
+    
+    def try_aspiration(self, game, depth, last_score):
+        """
+        Performs a move-search attempt within an 'aspiration window' around
+        the score found by the previous iteration of iterative deepening,
+        which allows alphabeta to prune more heavily.  If the true score falls
+        outside that window the search is repeated with a window twice as
+        wide, and eventually with no window at all.  (Minimax, and searches
+        following a forced win or loss, always use the full window.)
+        """
+        if self.method != 'alphabeta' or last_score in (MIN_VAL, MAX_VAL):
+            return self.try_move(game, depth)
+        
+        delta = self.ASPIRATION_WINDOW
+        while delta <= self.MAX_ASPIRATION_WINDOW:
+            lower_bound, upper_bound = last_score - delta, last_score + delta
+            result = self.try_move(game, depth, lower_bound, upper_bound)
+            if result is None or lower_bound < result[0] < upper_bound:
+                return result
+            delta *= 2
+        
+        return self.try_move(game, depth)
     
     
     def minimax(self, game, depth, maximize=True):
@@ -543,11 +1460,24 @@ class CustomPlayer:
         tuple(int, int)
             The best move for the current branch; (-1, -1) for no legal moves
         """
+        if isinstance(game, BitBoard):
+            return self.fast_alphabeta(game, depth, lower_bound, upper_bound, maximize, prune)
+        
+        if maximize:
+            return self.max_node(game, depth, lower_bound, upper_bound, prune)
+        return self.min_node(game, depth, lower_bound, upper_bound, prune)
+    
+    
+    def max_node(self, game, depth, lower_bound, upper_bound, prune):
+        """
+        Searches a maximizing layer of alphabeta_common (for states other than
+        BitBoards), recursing into min_node for the layer below.
+        """
         if self.time_left() < self.TIMER_THRESHOLD:
             raise Timeout()
         
         move_picked = (-1, -1)
-        best_score = MIN_VAL if maximize else MAX_VAL
+        best_score = MIN_VAL
         
         for move in game.get_legal_moves():
             
@@ -555,24 +1485,278 @@ class CustomPlayer:
                 break
             
             step = game.forecast_move(move)
+            self.min_depth_reached = min(self.min_depth_reached, depth)
             
             if depth <= 1:
-                self.min_depth_reached = min(self.min_depth_reached, depth)
                 move_score = self.score(step, self)
             else:
-                self.min_depth_reached = min(self.min_depth_reached, depth)
-                move_score, _ = self.alphabeta_common(step, depth - 1, lower_bound, upper_bound, not maximize, prune)
+                move_score, _ = self.min_node(step, depth - 1, lower_bound, upper_bound, prune)
             
-            if move_score > lower_bound and maximize:
+            if move_score > lower_bound:
                 lower_bound = best_score = move_score
                 move_picked = move
+        
+        return best_score, move_picked
+    
+    
+    def min_node(self, game, depth, lower_bound, upper_bound, prune):
+        """
+        Searches a minimizing layer of alphabeta_common (for states other than
+        BitBoards), recursing into max_node for the layer below.
+        """
+        if self.time_left() < self.TIMER_THRESHOLD:
+            raise Timeout()
+        
+        move_picked = (-1, -1)
+        best_score = MAX_VAL
+        
+        for move in game.get_legal_moves():
+            
+            if prune and lower_bound >= upper_bound:
+                break
+            
+            step = game.forecast_move(move)
+            self.min_depth_reached = min(self.min_depth_reached, depth)
+            
+            if depth <= 1:
+                move_score = self.score(step, self)
+            else:
+                move_score, _ = self.max_node(step, depth - 1, lower_bound, upper_bound, prune)
             
-            if move_score < upper_bound and not maximize:
+            if move_score < upper_bound:
                 upper_bound = best_score = move_score
                 move_picked = move
         
         return best_score, move_picked
-
+    
+    
+    def fast_alphabeta(self, game, depth, lower_bound, upper_bound, maximize, prune):
+        """
+        Implements alphabeta_common for BitBoard states, by way of
+        fast_negamax below.  (Scores and bounds are negated for minimizing
+        layers, so that every layer can be treated as maximizing.)
+        
+        The transposition table is kept from one search (and move) to the
+        next, and its scores are stored from the perspective of the player
+        to move, which is only consistent if maximize is True exactly when
+        this player is the one to move.  Searches that break that rule raise
+        a ValueError rather than mixing up the stored scores.
+        """
+        if maximize != (game.active_player == self):
+            raise ValueError("`maximize` must be True exactly when this player is to move.")
+        if maximize:
+            return self.fast_negamax(game, depth, lower_bound, upper_bound, 1, prune)
+        score, move = self.fast_negamax(game, depth, -upper_bound, -lower_bound, -1, prune)
+        return -score, move
+    
+    
+    def fast_negamax(self, game, depth, lower_bound, upper_bound, colour, prune, ply=0):
+        """
+        Searches a BitBoard state in negamax form, where scores are always
+        from the perspective of the player to move (colour is 1 where that is
+        this player, and -1 for the opponent.)  A transposition table keyed on
+        the board's Zobrist hash is kept, with entries recording the depth
+        searched, the score and whether that score is exact or a lower/upper
+        bound, so that states reached again (via a different order of moves)
+        can return immediately or narrow their bounds.  The table is
+        fixed-size, with slots in pairs: the first only replaced by an entry
+        searched at least as deep (or once left over from an earlier move),
+        and the second taking whatever the first turns away.
+        
+        Moves are tried in order of the best move stored for this state (which
+        is usually the principal variation from the previous iteration of
+        iterative deepening), then the two most recent 'killer' moves that
+        caused a cutoff at the same ply, then the remainder in order of their
+        'history' score: the sum of depth squared over every cutoff the move
+        has caused for the same player, at any ply.  (The ply argument counts
+        moves made since the root of the search.)  With pruning, moves after
+        the first are searched with a null window (of width NULL_WINDOW, as
+        scores needn't be integers), which only shows whether they can beat
+        the best score found so far, and are searched again with the full
+        window if so.
+        
+        Rather than forecasting a copy of the board for every move, moves are
+        applied to the board in place and then undone once searched, and are
+        handled internally as square indices rather than (row, col) pairs.
+        Attributes used within the move loop are looked up once per node, and
+        the timer is only checked once every TIME_CHECK_INTERVAL nodes (which
+        must be a power of two.)  Where the score function has a counterpart
+        in BATCH_SCORES, the leaves below a node are all scored together
+        without applying their moves at all.
+        
+        Sharing entries between symmetric states assumes that the score
+        function rates a board the same as its rotation or reflection, so is
+        only done for those listed in SYMMETRIC_SCORES.  (reflect_score, for
+        one, is not: on a board of even width or height the centre square
+        moves under reflection, and its mirroring test is only symmetric on
+        square boards.)
+        """
+        self.node_count += 1
+        if not self.node_count & (self.TIME_CHECK_INTERVAL - 1):
+            if self.time_left() < self.TIMER_THRESHOLD:
+                raise Timeout()
+        
+        # Under a score in SYMMETRIC_SCORES, states share the same entry with
+        # their 180-degree rotation and their horizontal and vertical
+        # reflections, with moves stored as seen from whichever has the
+        # smallest hash (each symmetry being its own inverse, the same mapping
+        # converts moves both ways.)
+        tt = self.tt
+        zobrist = game.zobrist
+        key = zobrist & ZOBRIST_MASK
+        rotated = False
+        if self.score in SYMMETRIC_SCORES:
+            lane_keys = ((zobrist >> 64) & ZOBRIST_MASK, (zobrist >> 128) & ZOBRIST_MASK, zobrist >> 192)
+            rotated_key = min(lane_keys)
+            rotated = rotated_key < key
+            if rotated:
+                key = rotated_key
+                rotate = game.geometry.lane_symmetries[lane_keys.index(rotated_key)]
+        slot = key & (self.TT_SIZE - 2)
+        entry = tt.get(slot)
+        if entry is None or entry[0] != key:
+            entry = tt.get(slot + 1)
+        tt_move = NO_SQUARE
+        window_low, window_high = lower_bound, upper_bound
+        
+        if entry is not None and entry[0] == key:
+            _, tt_depth, flag, value, tt_move, _ = entry
+            if rotated:
+                tt_move = rotate[tt_move]
+            if tt_depth >= depth:
+                if flag == TT_EXACT:
+                    return value, game.geometry.moves[tt_move]
+                if flag == TT_LOWER:
+                    if value >= upper_bound:
+                        return value, game.geometry.moves[tt_move]
+                    lower_bound = max(lower_bound, value)
+                else:
+                    if value <= lower_bound:
+                        return value, game.geometry.moves[tt_move]
+                    upper_bound = min(upper_bound, value)
+        
+        tt_low, tt_high = lower_bound, upper_bound
+        
+        killers = self.killers[ply]
+        moves = game.legal_squares()
+        ordered = []
+        for move in (tt_move, killers[0], killers[1]):
+            if move in moves and move not in ordered:
+                ordered.append(move)
+        history = self.history[game.active]
+        moves = sorted(moves, key=history.__getitem__, reverse=True)
+        if ordered:
+            moves = ordered + [move for move in moves if move not in ordered]
+        
+        move_picked = NO_SQUARE
+        best_score = MIN_VAL
+        
+        if moves and depth < self.min_depth_reached:
+            self.min_depth_reached = depth
+        
+        push, pop = game.push, game.pop
+        leaf_scores = None
+        if depth > 1:
+            search, child_depth, child_ply = self.fast_negamax, depth - 1, ply + 1
+            null_window, null_width = False, self.NULL_WINDOW
+        else:
+            score, lazy = self.score, self.lazy_eval
+            batch = None if lazy else BATCH_SCORES.get(score)
+            if batch is not None and NO_SQUARE not in (game.p1_sq, game.p2_sq):
+                leaf_scores = iter(batch(game, self, moves))
+        
+        for move in moves:
+            
+            if leaf_scores is not None:
+                move_score = colour * next(leaf_scores)
+            else:
+                push(move)
+                try:
+                    if depth > 1:
+                        null_bound = lower_bound + null_width
+                        if null_window and MIN_VAL < lower_bound and null_bound < upper_bound:
+                            move_score, _ = search(game, child_depth, -null_bound, -lower_bound, -colour, prune, child_ply)
+                            move_score = -move_score
+                        else:
+                            move_score = upper_bound
+                        if move_score > lower_bound:
+                            move_score, _ = search(game, child_depth, -upper_bound, -lower_bound, -colour, prune, child_ply)
+                            move_score = -move_score
+                        null_window = prune
+                    elif not lazy:
+                        move_score = colour * score(game, self)
+                    elif colour > 0:
+                        move_score = self.lazy_score(game, lower_bound, upper_bound)
+                    else:
+                        move_score = -self.lazy_score(game, -upper_bound, -lower_bound)
+                finally:
+                    pop()
+            
+            if move_score > lower_bound:
+                lower_bound = best_score = move_score
+                move_picked = move
+                
+                if prune and lower_bound >= upper_bound:
+                    if move != killers[0]:
+                        killers[0], killers[1] = move, killers[0]
+                    history[move] += depth * depth
+                    break
+        
+        # A stored bound may have narrowed the window (see above.)  If the
+        # search then fails against that bound, the bound is returned:
+        # returning MIN_VAL instead would claim the state is no better than
+        # the caller's lower bound, which the stored bound contradicts.  The
+        # stored bound may come from a deeper search, though, so at this
+        # depth the score is only known to lie on the failing side of it.
+        bound_flag = TT_EXACT
+        if tt_low > window_low and best_score <= tt_low:
+            best_score, move_picked = tt_low, tt_move
+            bound_flag = TT_UPPER
+        elif tt_high < window_high and best_score >= tt_high:
+            best_score = tt_high
+            bound_flag = TT_LOWER
+        
+        # Scores outside the search window only tell us which side of the
+        # window the true score lies, so they are stored as bounds.
+        age = self.last_move_count
+        stored_move = move_picked if best_score > window_low else tt_move
+        if rotated:
+            stored_move = rotate[stored_move]
+        if best_score >= window_high:
+            stored = (key, depth, TT_LOWER, window_high, stored_move, age)
+        elif best_score <= window_low:
+            stored = (key, depth, TT_UPPER, window_low, stored_move, age)
+        else:
+            stored = (key, depth, bound_flag, best_score, stored_move, age)
+        
+        entry = tt.get(slot)
+        if entry is None or entry[0] == key or entry[1] <= depth or entry[5] != age:
+            tt[slot] = stored
+        else:
+            tt[slot + 1] = stored
+        
+        return best_score, game.geometry.moves[move_picked]
+    
+    
+    def lazy_score(self, game, lower_bound, upper_bound):
+        """
+        Scores a leaf BitBoard state by first estimating it with the
+        difference in legal moves available to each player (as per the
+        'improved' heuristic.)  If that estimate already lies more than
+        LAZY_EVAL_MARGIN outside the search window it is returned as-is, since
+        it only needs to show which side of the window the score falls on.
+        Otherwise the full score function is called.
+        """
+        own_moves = popcount(game.legal_mask(self))
+        opp_moves = popcount(game.legal_mask(game.get_opponent(self)))
+        estimate = own_moves - opp_moves
+        
+        if estimate - self.LAZY_EVAL_MARGIN >= upper_bound:
+            return estimate
+        if estimate + self.LAZY_EVAL_MARGIN <= lower_bound:
+            return estimate
+        
+        return self.score(game, self)
 
 
 
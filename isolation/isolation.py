@@ -10,12 +10,15 @@ be available to project reviewers.
 
 import timeit
 
-from copy import deepcopy
 from copy import copy
 
 
 TIME_LIMIT_MILLIS = 200
 
+# Utility values for a won or lost game.
+MAX_VAL = float("inf")
+MIN_VAL = float("-inf")
+
 
 class Board(object):
     """
@@ -99,7 +102,7 @@ class Board(object):
         new_board.__inactive_player__ = self.__inactive_player__
         new_board.__last_player_move__ = copy(self.__last_player_move__)
         new_board.__player_symbols__ = copy(self.__player_symbols__)
-        new_board.__board_state__ = deepcopy(self.__board_state__)
+        new_board.__board_state__ = [row[:] for row in self.__board_state__]
         return new_board
 
     def forecast_move(self, move):
@@ -240,10 +243,10 @@ class Board(object):
         if not self.get_legal_moves(self.active_player):
 
             if player == self.inactive_player:
-                return float("inf")
+                return MAX_VAL
 
             if player == self.active_player:
-                return float("-inf")
+                return MIN_VAL
 
         return 0.
 
@@ -5,6 +5,10 @@ own agent and example heuristic functions.
 from random import randint
 
 
+MAX_VAL = float("inf")
+MIN_VAL = float("-inf")
+
+
 def null_score(game, player):
     """This heuristic presumes no knowledge for non-terminal states, and
     returns the same uninformative value for all other states.
@@ -27,10 +31,10 @@ def null_score(game, player):
     """
 
     if game.is_loser(player):
-        return float("-inf")
+        return MIN_VAL
 
     if game.is_winner(player):
-        return float("inf")
+        return MAX_VAL
 
     return 0.
 
@@ -56,10 +60,10 @@ def open_move_score(game, player):
         The heuristic value of the current game state
     """
     if game.is_loser(player):
-        return float("-inf")
+        return MIN_VAL
 
     if game.is_winner(player):
-        return float("inf")
+        return MAX_VAL
 
     return float(len(game.get_legal_moves(player)))
 
@@ -86,10 +90,10 @@ def improved_score(game, player):
         The heuristic value of the current game state
     """
     if game.is_loser(player):
-        return float("-inf")
+        return MIN_VAL
 
     if game.is_winner(player):
-        return float("inf")
+        return MAX_VAL
 
     own_moves = len(game.get_legal_moves(player))
     opp_moves = len(game.get_legal_moves(game.get_opponent(player)))